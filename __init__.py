@@ -3,7 +3,7 @@ from flask_login import LoginManager
 from flask_migrate import Migrate
 from config import Config
 from models import db, User
-from utils.model_handler import ModelHandler
+from utils.model_handler import get_handler
 from utils.email_service import EmailService
 
 # Import blueprint registration functions
@@ -41,7 +41,9 @@ def create_app():
         # but ModelHandler will likely fail later if model is missing.
     
     try:
-        model_handler = ModelHandler()
+        # Shared process-wide instance; repeated create_app calls (tests,
+        # multiple app objects) must not reload the model weights
+        model_handler = get_handler()
     except Exception as e:
         print(f"Failed to initialize model: {e}")
         model_handler = None
@@ -53,7 +53,31 @@ class Config:
     
     TARGET_IMAGE_SIZE = (380, 380)
     BATCH_SIZE = 16
+
+    # Inference quantization: '' (float32) or 'fp16' (half-size weights, less
+    # memory bandwidth per inference). Full int8 is deliberately not offered
+    # here - it needs representative-dataset calibration and can regress
+    # latency on x86 when ops fall off the quantized path.
+    QUANTIZATION = os.environ.get('MODEL_QUANTIZATION', '').lower()
+
+    # Inference runtime: 'tflite' (default) or 'onnxruntime'. The ORT path
+    # needs the optional onnxruntime and tf2onnx packages installed.
+    RUNTIME = os.environ.get('MODEL_RUNTIME', 'tflite').lower()
+
+    # Image decode backend for inference preprocessing: 'opencv' (default)
+    # or 'pillow'. The pillow path returns RGB directly and picks up
+    # Pillow-SIMD's AVX2 resampling kernels when that fork is installed.
+    DECODER = os.environ.get('IMAGE_DECODER', 'opencv').lower()
+
+    # Cache preprocessed inference inputs keyed by image content hash; set
+    # PREPROCESS_CACHE=0 to disable on memory-constrained workers
+    PREPROCESS_CACHE = os.environ.get('PREPROCESS_CACHE', '1').lower() not in ('0', 'false', 'no')
     
     REPORT_FOLDER = os.path.join(os.path.dirname(__file__), 'static', 'reports')
+
+    # Finished-PDF cache for repeat report downloads. Deliberately outside
+    # static/ - cached reports contain patient data and must only be served
+    # through the authenticated download routes, never as static files.
+    REPORT_CACHE_FOLDER = os.path.join(os.path.dirname(__file__), 'instance', 'report_cache')
     
 
@@ -0,0 +1,28 @@
+"""Add api_key_last4 to ai_model_settings
+
+Revision ID: c3f1a9d42b7e
+Revises:
+Create Date: 2026-09-01 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3f1a9d42b7e'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing rows keep NULL; ai_models.model_to_dict falls back to
+    # decrypting api_key_encrypted for the masked display until the row
+    # is next saved.
+    op.add_column('ai_model_settings',
+                  sa.Column('api_key_last4', sa.String(length=4), nullable=True))
+
+
+def downgrade():
+    op.drop_column('ai_model_settings', 'api_key_last4')
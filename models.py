@@ -109,6 +109,7 @@ class AiModelSettings(db.Model):
     base_url = db.Column(db.String(500))  # Custom base URL for custom providers
     model_name = db.Column(db.String(100), nullable=False)
     api_key_encrypted = db.Column(db.Text)  # Encrypted API key
+    api_key_last4 = db.Column(db.String(4))  # Plaintext tail for masked display without decryption
     temperature = db.Column(db.Float, default=0.7)
     max_tokens = db.Column(db.Integer, default=1000)
     enabled = db.Column(db.Boolean, default=True)
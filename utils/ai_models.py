@@ -2,16 +2,48 @@ import os
 import json
 import requests
 import re
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from cryptography.fernet import Fernet
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 import base64
 from typing import Dict, List, Optional, Any
 import logging
+import threading
+import time
+from functools import lru_cache
 from bs4 import BeautifulSoup
+from sqlalchemy import case
+from sqlalchemy.orm import load_only
+from models import User, AiModelSettings, db
+
+try:
+    # orjson parses medium JSON payloads 2-3x faster than stdlib json
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
 
 logger = logging.getLogger(__name__)
 
+# Shared session with connection pooling and retry/backoff for all provider calls.
+# 429/5xx responses are retried with backoff (honouring Retry-After); after the
+# retries are exhausted the final response is returned so the per-provider
+# status-code handling below still applies.
+_retry_policy = Retry(
+    total=3,
+    backoff_factor=0.3,
+    status_forcelist=[429, 500, 502, 503, 504],
+    allowed_methods=['POST'],
+    respect_retry_after_header=True,
+    raise_on_status=False,
+)
+_http_session = requests.Session()
+_http_adapter = HTTPAdapter(max_retries=_retry_policy, pool_connections=10, pool_maxsize=10)
+_http_session.mount('https://', _http_adapter)
+_http_session.mount('http://', _http_adapter)
+
 class AIModelManager:
     """Manager for AI model configuration and operations"""
     
@@ -40,21 +72,31 @@ class AIModelManager:
             # Fallback for testing
             self.fernet = Fernet(base64.urlsafe_b64encode(b'x' * 32))
     
-    def encrypt_api_key(self, raw_key: str) -> str:
+    def encrypt_api_key(self, raw_key) -> str:
         """Encrypt API key for storage"""
-        if not raw_key or not raw_key.strip():
+        if not raw_key:
             return ""
         try:
+            # Fast path: Fernet accepts bytes directly, skip the re-encode
+            if isinstance(raw_key, (bytes, bytearray)):
+                if not raw_key.strip():
+                    return ""
+                return self.fernet.encrypt(bytes(raw_key)).decode()
+            if not raw_key.strip():
+                return ""
             return self.fernet.encrypt(raw_key.encode()).decode()
         except Exception as e:
             logger.error(f"Encryption error: {str(e)}")
             return ""
-    
-    def decrypt_api_key(self, encrypted_key: str) -> str:
+
+    def decrypt_api_key(self, encrypted_key) -> str:
         """Decrypt API key for use"""
         if not encrypted_key:
             return ""
         try:
+            # Fast path: pass bytes tokens straight through to Fernet
+            if isinstance(encrypted_key, (bytes, bytearray)):
+                return self.fernet.decrypt(bytes(encrypted_key)).decode()
             return self.fernet.decrypt(encrypted_key.encode()).decode()
         except Exception as e:
             logger.error(f"Decryption error: {str(e)}")
@@ -168,12 +210,17 @@ class AIModelManager:
             }
         ]
 
+
+@lru_cache(maxsize=1)
+def _get_manager() -> "AIModelManager":
+    """Process-wide AIModelManager, built once (key derivation is expensive)"""
+    return AIModelManager()
+
 # Provider-specific calling functions
-def call_openai(model_config: Dict, clinical_payload: Dict) -> Dict[str, Any]:
+def call_openai(model_config: Dict, clinical_payload: Dict, prompts: Optional[tuple] = None) -> Dict[str, Any]:
     """Call OpenAI API"""
     try:
-        from utils.ai_models import AIModelManager
-        manager = AIModelManager()
+        manager = _get_manager()
         api_key = manager.decrypt_api_key(model_config.get('api_key_encrypted', ''))
         
         if not api_key:
@@ -184,8 +231,11 @@ def call_openai(model_config: Dict, clinical_payload: Dict) -> Dict[str, Any]:
             'Authorization': f'Bearer {api_key}'
         }
         
-        system_prompt = build_system_prompt()
-        user_prompt = build_user_prompt(clinical_payload)
+        if prompts is not None:
+            system_prompt, user_prompt = prompts
+        else:
+            system_prompt = build_system_prompt()
+            user_prompt = build_user_prompt(clinical_payload)
         
         data = {
             'model': model_config['model_name'],
@@ -197,7 +247,7 @@ def call_openai(model_config: Dict, clinical_payload: Dict) -> Dict[str, Any]:
             'max_tokens': model_config.get('max_tokens', 1000)
         }
         
-        response = requests.post(
+        response = _http_session.post(
             f"{model_config.get('base_url', 'https://api.openai.com/v1')}/chat/completions",
             headers=headers,
             json=data,
@@ -209,20 +259,16 @@ def call_openai(model_config: Dict, clinical_payload: Dict) -> Dict[str, Any]:
             content = result['choices'][0]['message']['content']
             return parse_ai_response(content)
         else:
-            return {'error': f"API error: {response.status_code} - {response.text}"}
+            return {'error': f"API error: {response.status_code} - {response.content[:500].decode('utf-8', errors='replace')}"}
             
     except Exception as e:
         logger.error(f"OpenAI API error: {str(e)}")
         return {'error': f"OpenAI API call failed: {str(e)}"}
 
-def call_gemini(model_config: Dict, clinical_payload: Dict) -> Dict[str, Any]:
+def call_gemini(model_config: Dict, clinical_payload: Dict, prompts: Optional[tuple] = None) -> Dict[str, Any]:
     """Call Google Gemini API with correct model names and API structure"""
     try:
-        from utils.ai_models import AIModelManager
-        import requests
-        import json
-        
-        manager = AIModelManager()
+        manager = _get_manager()
         api_key = manager.decrypt_api_key(model_config.get('api_key_encrypted', ''))
         
         if not api_key:
@@ -240,8 +286,11 @@ def call_gemini(model_config: Dict, clinical_payload: Dict) -> Dict[str, Any]:
         # Gemini 1.0 models don't support JSON mode, so we need to handle that in the prompt
         
         # --- 2. BUILD PROMPT WITH STRONG JSON ENFORCEMENT ---
-        system_prompt = build_system_prompt()
-        user_prompt = build_user_prompt(clinical_payload)
+        if prompts is not None:
+            system_prompt, user_prompt = prompts
+        else:
+            system_prompt = build_system_prompt()
+            user_prompt = build_user_prompt(clinical_payload)
         
         # Enhanced prompt with very clear JSON instructions
         enhanced_system_prompt = system_prompt + "\n\nCRITICAL: Your response MUST be a COMPLETE, VALID JSON object. Do not include any text outside the JSON. Start with { and end with }. Do not use markdown code blocks."
@@ -288,7 +337,7 @@ def call_gemini(model_config: Dict, clinical_payload: Dict) -> Dict[str, Any]:
         # Log the request for debugging
         logger.debug(f"Gemini API request to: {api_url}")
         
-        response = requests.post(api_url, json=data, timeout=60)
+        response = _http_session.post(api_url, json=data, timeout=60)
         
         # --- 5. RESPONSE HANDLING ---
         if response.status_code == 200:
@@ -346,12 +395,18 @@ def call_gemini(model_config: Dict, clinical_payload: Dict) -> Dict[str, Any]:
                             return {'error': f'Could not parse AI response: {str(parse_error)}', 'raw_content': content[:200]}
                 else:
                     # No content found in response
-                    logger.error(f"No content in Gemini response: {json.dumps(result, indent=2)}")
+                    # Lazy %-style so the payload is only stringified when a handler accepts it;
+                    # pretty-printing the full body goes to DEBUG only
+                    logger.error("No content in Gemini response: %s", result)
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("Gemini response body: %s", json.dumps(result, indent=2))
                     return {'error': 'Empty content in Gemini API response'}
             
             else:
                 # No candidates in response
-                logger.error(f"No candidates in Gemini response: {json.dumps(result, indent=2)}")
+                logger.error("No candidates in Gemini response: %s", result)
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Gemini response body: %s", json.dumps(result, indent=2))
                 
                 # Check for error in response
                 if 'error' in result:
@@ -372,20 +427,19 @@ def call_gemini(model_config: Dict, clinical_payload: Dict) -> Dict[str, Any]:
                 elif 'message' in error_data:
                     error_msg += f": {error_data['message']}"
             except:
-                error_msg += f": {response.text[:500]}"
+                error_msg += f": {response.content[:500].decode('utf-8', errors='replace')}"
             
             logger.error(f"Gemini API error: {error_msg}")
             return {'error': error_msg}
             
     except Exception as e:
-        logger.error(f"Gemini API call failed: {str(e)}", exc_info=True)
+        logger.error(f"Gemini API call failed: {str(e)}", exc_info=logger.isEnabledFor(logging.DEBUG))
         return {'error': f"Gemini API call failed: {str(e)}"}
 
-def call_perplexity(model_config: Dict, clinical_payload: Dict) -> Dict[str, Any]:
+def call_perplexity(model_config: Dict, clinical_payload: Dict, prompts: Optional[tuple] = None) -> Dict[str, Any]:
     """Call Perplexity API with correct model names"""
     try:
-        from utils.ai_models import AIModelManager
-        manager = AIModelManager()
+        manager = _get_manager()
         api_key = manager.decrypt_api_key(model_config.get('api_key_encrypted', ''))
         
         if not api_key:
@@ -396,8 +450,11 @@ def call_perplexity(model_config: Dict, clinical_payload: Dict) -> Dict[str, Any
             'Authorization': f'Bearer {api_key}'
         }
         
-        system_prompt = build_system_prompt()
-        user_prompt = build_user_prompt(clinical_payload)
+        if prompts is not None:
+            system_prompt, user_prompt = prompts
+        else:
+            system_prompt = build_system_prompt()
+            user_prompt = build_user_prompt(clinical_payload)
         
         # Use correct Perplexity model names
         model_name = model_config['model_name']
@@ -418,7 +475,7 @@ def call_perplexity(model_config: Dict, clinical_payload: Dict) -> Dict[str, Any
             'stream': False
         }
         
-        response = requests.post(
+        response = _http_session.post(
             f"{model_config.get('base_url', 'https://api.perplexity.ai')}/chat/completions",
             headers=headers,
             json=data,
@@ -454,8 +511,6 @@ def call_perplexity(model_config: Dict, clinical_payload: Dict) -> Dict[str, Any
                 # Look for specific error patterns
                 if 'unauthorized' in text.lower() or '401' in text:
                     return {'error': "Authentication Error: Invalid API key or unauthorized access"}
-                elif 'rate limit' in text.lower() or '429' in text:
-                    return {'error': "Rate Limit Error: Too many requests to the API"}
                 elif 'not found' in text.lower() or '404' in text:
                     return {'error': "Endpoint Error: API endpoint not found"}
                 elif 'server error' in text.lower() or '500' in text:
@@ -489,18 +544,17 @@ def call_perplexity(model_config: Dict, clinical_payload: Dict) -> Dict[str, Any
                 if 'error' in error_data:
                     error_msg += f" - {error_data['error'].get('message', str(error_data))}"
             except:
-                error_msg += f" - {response.text}"
+                error_msg += f" - {response.content[:500].decode('utf-8', errors='replace')}"
             return {'error': error_msg}
             
     except Exception as e:
         logger.error(f"Perplexity API error: {str(e)}")
         return {'error': f"Perplexity API call failed: {str(e)}"}
 
-def call_grok(model_config: Dict, clinical_payload: Dict) -> Dict[str, Any]:
+def call_grok(model_config: Dict, clinical_payload: Dict, prompts: Optional[tuple] = None) -> Dict[str, Any]:
     """Call xAI Grok API"""
     try:
-        from utils.ai_models import AIModelManager
-        manager = AIModelManager()
+        manager = _get_manager()
         api_key = manager.decrypt_api_key(model_config.get('api_key_encrypted', ''))
         
         if not api_key:
@@ -511,8 +565,11 @@ def call_grok(model_config: Dict, clinical_payload: Dict) -> Dict[str, Any]:
             'Authorization': f'Bearer {api_key}'
         }
         
-        system_prompt = build_system_prompt()
-        user_prompt = build_user_prompt(clinical_payload)
+        if prompts is not None:
+            system_prompt, user_prompt = prompts
+        else:
+            system_prompt = build_system_prompt()
+            user_prompt = build_user_prompt(clinical_payload)
         
         data = {
             'model': model_config['model_name'],
@@ -525,7 +582,7 @@ def call_grok(model_config: Dict, clinical_payload: Dict) -> Dict[str, Any]:
             'stream': False
         }
         
-        response = requests.post(
+        response = _http_session.post(
             f"{model_config.get('base_url', 'https://api.x.ai/v1')}/chat/completions",
             headers=headers,
             json=data,
@@ -543,18 +600,17 @@ def call_grok(model_config: Dict, clinical_payload: Dict) -> Dict[str, Any]:
                 if 'error' in error_data:
                     error_msg += f" - {error_data['error'].get('message', str(error_data))}"
             except:
-                error_msg += f" - {response.text}"
+                error_msg += f" - {response.content[:500].decode('utf-8', errors='replace')}"
             return {'error': error_msg}
             
     except Exception as e:
         logger.error(f"Grok API error: {str(e)}")
         return {'error': f"Grok API call failed: {str(e)}"}
 
-def call_deepseek(model_config: Dict, clinical_payload: Dict) -> Dict[str, Any]:
+def call_deepseek(model_config: Dict, clinical_payload: Dict, prompts: Optional[tuple] = None) -> Dict[str, Any]:
     """Call DeepSeek API"""
     try:
-        from utils.ai_models import AIModelManager
-        manager = AIModelManager()
+        manager = _get_manager()
         api_key = manager.decrypt_api_key(model_config.get('api_key_encrypted', ''))
         
         if not api_key:
@@ -565,8 +621,11 @@ def call_deepseek(model_config: Dict, clinical_payload: Dict) -> Dict[str, Any]:
             'Authorization': f'Bearer {api_key}'
         }
         
-        system_prompt = build_system_prompt()
-        user_prompt = build_user_prompt(clinical_payload)
+        if prompts is not None:
+            system_prompt, user_prompt = prompts
+        else:
+            system_prompt = build_system_prompt()
+            user_prompt = build_user_prompt(clinical_payload)
         
         data = {
             'model': model_config['model_name'],
@@ -579,7 +638,7 @@ def call_deepseek(model_config: Dict, clinical_payload: Dict) -> Dict[str, Any]:
             'stream': False
         }
         
-        response = requests.post(
+        response = _http_session.post(
             f"{model_config.get('base_url', 'https://api.deepseek.com')}/chat/completions",
             headers=headers,
             json=data,
@@ -597,18 +656,17 @@ def call_deepseek(model_config: Dict, clinical_payload: Dict) -> Dict[str, Any]:
                 if 'error' in error_data:
                     error_msg += f" - {error_data['error'].get('message', str(error_data))}"
             except:
-                error_msg += f" - {response.text}"
+                error_msg += f" - {response.content[:500].decode('utf-8', errors='replace')}"
             return {'error': error_msg}
             
     except Exception as e:
         logger.error(f"DeepSeek API error: {str(e)}")
         return {'error': f"DeepSeek API call failed: {str(e)}"}
 
-def call_glm(model_config: Dict, clinical_payload: Dict) -> Dict[str, Any]:
+def call_glm(model_config: Dict, clinical_payload: Dict, prompts: Optional[tuple] = None) -> Dict[str, Any]:
     """Call GLM API - This is working well, keeping as is"""
     try:
-        from utils.ai_models import AIModelManager
-        manager = AIModelManager()
+        manager = _get_manager()
         api_key = manager.decrypt_api_key(model_config.get('api_key_encrypted', ''))
         
         if not api_key:
@@ -619,8 +677,11 @@ def call_glm(model_config: Dict, clinical_payload: Dict) -> Dict[str, Any]:
             'Authorization': f'Bearer {api_key}'
         }
         
-        system_prompt = build_system_prompt()
-        user_prompt = build_user_prompt(clinical_payload)
+        if prompts is not None:
+            system_prompt, user_prompt = prompts
+        else:
+            system_prompt = build_system_prompt()
+            user_prompt = build_user_prompt(clinical_payload)
         
         data = {
             'model': model_config['model_name'],
@@ -633,7 +694,7 @@ def call_glm(model_config: Dict, clinical_payload: Dict) -> Dict[str, Any]:
             'stream': False
         }
         
-        response = requests.post(
+        response = _http_session.post(
             f"{model_config.get('base_url', 'https://open.bigmodel.cn/api/paas/v4')}/chat/completions",
             headers=headers,
             json=data,
@@ -651,18 +712,17 @@ def call_glm(model_config: Dict, clinical_payload: Dict) -> Dict[str, Any]:
                 if 'error' in error_data:
                     error_msg += f" - {error_data['error'].get('message', str(error_data))}"
             except:
-                error_msg += f" - {response.text}"
+                error_msg += f" - {response.content[:500].decode('utf-8', errors='replace')}"
             return {'error': error_msg}
             
     except Exception as e:
         logger.error(f"GLM API error: {str(e)}")
         return {'error': f"GLM API call failed: {str(e)}"}
 
-def call_custom_provider(model_config: Dict, clinical_payload: Dict) -> Dict[str, Any]:
+def call_custom_provider(model_config: Dict, clinical_payload: Dict, prompts: Optional[tuple] = None) -> Dict[str, Any]:
     """Call custom provider API"""
     try:
-        from utils.ai_models import AIModelManager
-        manager = AIModelManager()
+        manager = _get_manager()
         api_key = manager.decrypt_api_key(model_config.get('api_key_encrypted', ''))
         
         headers = {
@@ -673,8 +733,11 @@ def call_custom_provider(model_config: Dict, clinical_payload: Dict) -> Dict[str
             # Assume Bearer token authentication for custom providers
             headers['Authorization'] = f'Bearer {api_key}'
         
-        system_prompt = build_system_prompt()
-        user_prompt = build_user_prompt(clinical_payload)
+        if prompts is not None:
+            system_prompt, user_prompt = prompts
+        else:
+            system_prompt = build_system_prompt()
+            user_prompt = build_user_prompt(clinical_payload)
         
         # Try OpenAI-compatible format first
         data = {
@@ -688,7 +751,7 @@ def call_custom_provider(model_config: Dict, clinical_payload: Dict) -> Dict[str
             'stream': False
         }
         
-        response = requests.post(
+        response = _http_session.post(
             f"{model_config['base_url']}/chat/completions",
             headers=headers,
             json=data,
@@ -712,16 +775,15 @@ def call_custom_provider(model_config: Dict, clinical_payload: Dict) -> Dict[str
                 if 'error' in error_data:
                     error_msg += f" - {error_data['error'].get('message', str(error_data))}"
             except:
-                error_msg += f" - {response.text}"
+                error_msg += f" - {response.content[:500].decode('utf-8', errors='replace')}"
             return {'error': error_msg}
             
     except Exception as e:
         logger.error(f"Custom provider API error: {str(e)}")
         return {'error': f"Custom provider API call failed: {str(e)}"}
 
-def build_system_prompt() -> str:
-    """Build system prompt for AI model"""
-    return """You are a medical AI assistant specializing in diabetic retinopathy. 
+# Static system prompt, built once at import time
+_SYSTEM_PROMPT = """You are a medical AI assistant specializing in diabetic retinopathy.
 Provide structured treatment suggestions and clinical guidance based on retinal analysis results.
 
 Always respond in this exact JSON format and ensure the entire response is complete (do not truncate):
@@ -752,6 +814,10 @@ CRITICAL INSTRUCTIONS:
 
 Be concise, clinical, and evidence-based in your recommendations. Focus on diabetic retinopathy management and treatment."""
 
+def build_system_prompt() -> str:
+    """Return the static system prompt for AI models"""
+    return _SYSTEM_PROMPT
+
 def build_user_prompt(clinical_payload: Dict) -> str:
     """Build user prompt from clinical data with enhanced medical details"""
     patient_info = clinical_payload.get('patient_info', {})
@@ -774,6 +840,14 @@ def build_user_prompt(clinical_payload: Dict) -> str:
     age = patient_info.get('age', 'Not specified')
     gender = patient_info.get('gender', 'Not specified')
     
+    # Build the per-image result lines once, then interpolate into one f-string
+    # (avoids O(n^2) str += concatenation when many images are analysed)
+    image_lines = "\n".join(
+        f"- Image {i+1}: {result['class_name']} (Confidence: {result.get('confidence_percent', 0):.1f}%)"
+        for i, result in enumerate(results)
+        if 'class_name' in result
+    )
+
     prompt = f"""
 PATIENT DEMOGRAPHICS:
 - Name: {patient_name}
@@ -781,15 +855,8 @@ PATIENT DEMOGRAPHICS:
 - Gender: {gender}
 
 DIABETIC RETINOPATHY ANALYSIS RESULTS:
-"""
-    
-    # Add detailed results for each image
-    for i, result in enumerate(results):
-        if 'class_name' in result:
-            confidence = result.get('confidence_percent', 0)
-            prompt += f"- Image {i+1}: {result['class_name']} (Confidence: {confidence:.1f}%)\n"
-    
-    prompt += f"""
+{image_lines}
+
 CLINICAL CONCLUSION FROM ANALYSIS:
 {conclusion}
 
@@ -816,25 +883,33 @@ Based on this comprehensive clinical information for {patient_name}, please prov
 """
     return prompt
 
+# Precompiled patterns for the hot AI-response parsing path; the alternation
+# extracts all partial-JSON fields in a single scan of the content
+_PARTIAL_RE = re.compile(
+    r'"(summary_for_doctor|patient_friendly_summary)"\s*:\s*"([^"]*)'
+    r'|"treatment_plan"\s*:\s*\[([^\]]*)',
+    re.DOTALL)
+_QUOTED_ITEM_RE = re.compile(r'"([^"]*?)"')
+
 def parse_ai_response(content: str) -> Dict[str, Any]:
     """Parse AI response into structured format with robust cleanup"""
     try:
         if not content:
             raise ValueError("Empty response content")
 
-        # 1. Strip Markdown Code Blocks (```json ... ```)
-        cleaned_content = re.sub(r'```json\s*', '', content, flags=re.IGNORECASE)
-        cleaned_content = re.sub(r'```\s*', '', cleaned_content)
-        
-        # 2. Find the first '{' and last '}' to strip conversational filler
-        start_idx = cleaned_content.find('{')
-        end_idx = cleaned_content.rfind('}')
-        
+        # 1. Locate the JSON braces directly - they bracket the payload, which
+        # makes stripping Markdown fences and conversational filler redundant
+        start_idx = content.find('{')
+        end_idx = content.rfind('}')
+
         if start_idx != -1 and end_idx != -1:
-            cleaned_content = cleaned_content[start_idx : end_idx + 1]
+            cleaned_content = content[start_idx : end_idx + 1]
+        else:
+            # No braces at all; drop any fences and let json raise a clear error
+            cleaned_content = content.replace('```json', '').replace('```JSON', '').replace('```', '')
         
         # 3. Parse
-        parsed_data = json.loads(cleaned_content)
+        parsed_data = _json_loads(cleaned_content)
         
         # 4. Validate & Default (Keep existing validation logic)
         required_fields = ['summary_for_doctor', 'patient_friendly_summary', 'treatment_plan']
@@ -857,32 +932,24 @@ def parse_ai_response(content: str) -> Dict[str, Any]:
 def _extract_partial_json(content: str) -> Dict[str, Any]:
     """Extract partial JSON data from truncated content"""
     try:
-        # Try to extract key-value pairs manually
+        # Extract all recoverable fields in one pass over the content
         result = {}
-        
-        # Extract summary_for_doctor (everything before the first array)
-        summary_match = re.search(r'"summary_for_doctor"\s*:\s*"([^"]*)', content)
-        if summary_match:
-            result['summary_for_doctor'] = summary_match.group(1)
-        else:
-            result['summary_for_doctor'] = "Partial summary extracted from truncated response"
-        
-        # Extract patient_friendly_summary
-        patient_match = re.search(r'"patient_friendly_summary"\s*:\s*"([^"]*)', content)
-        if patient_match:
-            result['patient_friendly_summary'] = patient_match.group(1)
-        else:
-            result['patient_friendly_summary'] = "Patient-friendly summary not available in truncated response"
-        
-        # Extract arrays with basic pattern matching
-        treatment_match = re.search(r'"treatment_plan"\s*:\s*$(.*?)$', content, re.DOTALL)
-        if treatment_match:
-            # Simple extraction of array items
-            items = re.findall(r'"([^"]*?)"', treatment_match.group(1))
+        treatment_body = None
+        for match in _PARTIAL_RE.finditer(content):
+            if match.group(1):
+                result.setdefault(match.group(1), match.group(2))
+            elif treatment_body is None:
+                treatment_body = match.group(3)
+
+        result.setdefault('summary_for_doctor', "Partial summary extracted from truncated response")
+        result.setdefault('patient_friendly_summary', "Patient-friendly summary not available in truncated response")
+
+        if treatment_body is not None:
+            items = _QUOTED_ITEM_RE.findall(treatment_body)
             result['treatment_plan'] = items if items else ["Treatment plan not fully available in truncated response"]
         else:
             result['treatment_plan'] = ["Treatment plan not available in truncated response"]
-        
+
         return result
     except Exception as e:
         logger.error(f"Error in partial JSON extraction: {str(e)}")
@@ -897,52 +964,92 @@ def _extract_partial_json(content: str) -> Dict[str, Any]:
             'disclaimer': 'This response was truncated and may be incomplete.'
         }
 
-def generate_prescription_suggestions(model_config: Dict, clinical_payload: Dict) -> Dict[str, Any]:
+# Provider dispatch table, built once after the provider functions are defined
+_PROVIDER_DISPATCH = {
+    'openai': call_openai,
+    'gemini': call_gemini,
+    'perplexity': call_perplexity,
+    'grok': call_grok,
+    'deepseek': call_deepseek,
+    'glm': call_glm,
+    'custom': call_custom_provider
+}
+
+def generate_prescription_suggestions(model_config: Dict, clinical_payload: Dict, prompts: Optional[tuple] = None) -> Dict[str, Any]:
     """Master gateway function for AI prescription generation"""
-    
+
     provider = model_config.get('provider_name', '').lower()
-    
-    provider_functions = {
-        'openai': call_openai,
-        'gemini': call_gemini,
-        'perplexity': call_perplexity,
-        'grok': call_grok,
-        'deepseek': call_deepseek,
-        'glm': call_glm,
-        'custom': call_custom_provider
-    }
-    
-    if provider in provider_functions:
-        return provider_functions[provider](model_config, clinical_payload)
-    else:
-        return {'error': f"Unsupported provider: {provider}"}
+
+    provider_function = _PROVIDER_DISPATCH.get(provider)
+    if provider_function is not None:
+        return provider_function(model_config, clinical_payload, prompts=prompts)
+    return {'error': f"Unsupported provider: {provider}"}
+
+def call_many(model_configs: List[Dict], clinical_payload: Dict) -> Dict[str, Dict]:
+    """Fan one clinical payload out to several providers, building the prompts once"""
+    prompts = (build_system_prompt(), build_user_prompt(clinical_payload))
+
+    results = {}
+    for model_config in model_configs:
+        key = f"{model_config.get('provider_name', '')}/{model_config.get('model_name', '')}"
+        results[key] = generate_prescription_suggestions(model_config, clinical_payload, prompts=prompts)
+    return results
+
+# Active-model lookups change rarely but run on many requests; cache them
+# per user for a short TTL and invalidate on any model mutation
+_ACTIVE_MODEL_TTL = 30  # seconds
+_active_model_cache: Dict[int, tuple] = {}
+_active_model_lock = threading.Lock()
+
+def _invalidate_active_model(user_id: int) -> None:
+    """Drop the cached active-model entry for a user"""
+    with _active_model_lock:
+        _active_model_cache.pop(user_id, None)
 
 # Database helper functions
 def load_models_for_user(user_id: int) -> List[Dict]:
     """Load all AI models for a user"""
-    from models import AiModelSettings
-    models = AiModelSettings.query.filter_by(user_id=user_id).order_by(AiModelSettings.created_at.desc()).all()
+    # Fetch only the columns the listing renders; the encrypted key blob is
+    # deferred and only loaded for legacy rows without api_key_last4
+    models = (
+        AiModelSettings.query
+        .options(load_only(
+            AiModelSettings.id, AiModelSettings.user_id, AiModelSettings.provider_name,
+            AiModelSettings.base_url, AiModelSettings.model_name, AiModelSettings.api_key_last4,
+            AiModelSettings.temperature, AiModelSettings.max_tokens, AiModelSettings.enabled,
+            AiModelSettings.created_at, AiModelSettings.updated_at))
+        .filter_by(user_id=user_id)
+        .order_by(AiModelSettings.created_at.desc())
+        .all()
+    )
     return [model_to_dict(model) for model in models]
 
 def load_active_model(user_id: int) -> Optional[Dict]:
     """Load the user's active (last selected) model"""
-    from models import User, AiModelSettings
-    user = User.query.get(user_id)
-    if user and user.last_selected_model_id:
-        model = AiModelSettings.query.get(user.last_selected_model_id)
-        if model and model.enabled and model.user_id == user_id:
-            return model_to_dict(model)
-    
-    # If no active model, return the first available enabled model
-    models = AiModelSettings.query.filter_by(user_id=user_id, enabled=True).order_by(AiModelSettings.created_at.asc()).all()
-    if models:
-        return model_to_dict(models[0])
-    
-    return None
+    now = time.monotonic()
+    with _active_model_lock:
+        entry = _active_model_cache.get(user_id)
+        if entry and now - entry[0] < _ACTIVE_MODEL_TTL:
+            # Copy so callers can't mutate the cached dict
+            return dict(entry[1]) if entry[1] is not None else None
+
+    # One round trip: prefer the user's last-selected model, otherwise fall
+    # back to the oldest enabled model - the DB resolves both in one query
+    model = (
+        db.session.query(AiModelSettings)
+        .outerjoin(User, (User.id == user_id) & (User.last_selected_model_id == AiModelSettings.id))
+        .filter(AiModelSettings.user_id == user_id, AiModelSettings.enabled == True)
+        .order_by(case((User.id.isnot(None), 0), else_=1), AiModelSettings.created_at.asc())
+        .first()
+    )
+    result = model_to_dict(model) if model else None
+
+    with _active_model_lock:
+        _active_model_cache[user_id] = (now, result)
+    return dict(result) if result is not None else None
 
 def update_last_selected_model(user_id: int, model_id: int) -> bool:
     """Update user's last selected model"""
-    from models import User, AiModelSettings, db
     try:
         user = User.query.get(user_id)
         model = AiModelSettings.query.get(model_id)
@@ -950,6 +1057,7 @@ def update_last_selected_model(user_id: int, model_id: int) -> bool:
         if model and model.user_id == user_id and model.enabled:
             user.last_selected_model_id = model_id
             db.session.commit()
+            _invalidate_active_model(user_id)
             return True
         return False
     except Exception as e:
@@ -959,21 +1067,21 @@ def update_last_selected_model(user_id: int, model_id: int) -> bool:
 
 def save_model_for_user(user_id: int, data: Dict) -> tuple[bool, Dict, str]:
     """Save new AI model for user"""
-    from models import AiModelSettings, db
-    from utils.ai_models import AIModelManager
-    
+
     try:
-        manager = AIModelManager()
-        
-        # Encrypt API key
-        encrypted_key = manager.encrypt_api_key(data.get('api_key', ''))
+        manager = _get_manager()
         
+        # Encrypt API key, keeping the last 4 chars for masked display
+        raw_key = data.get('api_key', '')
+        encrypted_key = manager.encrypt_api_key(raw_key)
+
         model = AiModelSettings(
             user_id=user_id,
             provider_name=data['provider_name'],
             base_url=data.get('base_url', ''),
             model_name=data['model_name'],
             api_key_encrypted=encrypted_key,
+            api_key_last4=raw_key[-4:] if raw_key else None,
             temperature=float(data.get('temperature', 0.7)),
             max_tokens=int(data.get('max_tokens', 1000)),
             enabled=bool(data.get('enabled', True))
@@ -981,7 +1089,8 @@ def save_model_for_user(user_id: int, data: Dict) -> tuple[bool, Dict, str]:
         
         db.session.add(model)
         db.session.commit()
-        
+        _invalidate_active_model(user_id)
+
         return True, model_to_dict(model), "Model saved successfully"
         
     except Exception as e:
@@ -991,11 +1100,9 @@ def save_model_for_user(user_id: int, data: Dict) -> tuple[bool, Dict, str]:
 
 def update_model_for_user(user_id: int, model_id: int, data: Dict) -> tuple[bool, Dict, str]:
     """Update existing AI model for user"""
-    from models import AiModelSettings, db
-    from utils.ai_models import AIModelManager
-    
+
     try:
-        manager = AIModelManager()
+        manager = _get_manager()
         model = AiModelSettings.query.filter_by(id=model_id, user_id=user_id).first()
         
         if not model:
@@ -1011,9 +1118,11 @@ def update_model_for_user(user_id: int, model_id: int, data: Dict) -> tuple[bool
         # Only update API key if provided
         if 'api_key' in data and data['api_key']:
             model.api_key_encrypted = manager.encrypt_api_key(data['api_key'])
+            model.api_key_last4 = data['api_key'][-4:]
         
         db.session.commit()
-        
+        _invalidate_active_model(user_id)
+
         return True, model_to_dict(model), "Model updated successfully"
         
     except Exception as e:
@@ -1023,8 +1132,6 @@ def update_model_for_user(user_id: int, model_id: int, data: Dict) -> tuple[bool
 
 def delete_model_for_user(user_id: int, model_id: int) -> tuple[bool, str]:
     """Delete AI model for user"""
-    from models import AiModelSettings, User, db
-    
     try:
         model = AiModelSettings.query.filter_by(id=model_id, user_id=user_id).first()
         
@@ -1038,7 +1145,8 @@ def delete_model_for_user(user_id: int, model_id: int) -> tuple[bool, str]:
         
         db.session.delete(model)
         db.session.commit()
-        
+        _invalidate_active_model(user_id)
+
         return True, "Model deleted successfully"
         
     except Exception as e:
@@ -1048,16 +1156,23 @@ def delete_model_for_user(user_id: int, model_id: int) -> tuple[bool, str]:
 
 def model_to_dict(model) -> Dict:
     """Convert model object to dictionary"""
-    from utils.ai_models import AIModelManager
-    manager = AIModelManager()
-    
+    # Mask from the stored last-4 characters instead of decrypting every row;
+    # rows saved before api_key_last4 existed fall back to the decrypt path
+    if model.api_key_last4:
+        api_key_masked = "•" * 4 + model.api_key_last4
+    elif model.api_key_encrypted:
+        manager = _get_manager()
+        api_key_masked = manager.mask_api_key(manager.decrypt_api_key(model.api_key_encrypted))
+    else:
+        api_key_masked = ""
+
     return {
         'id': model.id,
         'user_id': model.user_id,
         'provider_name': model.provider_name,
         'base_url': model.base_url,
         'model_name': model.model_name,
-        'api_key_masked': manager.mask_api_key(manager.decrypt_api_key(model.api_key_encrypted)),
+        'api_key_masked': api_key_masked,
         'temperature': model.temperature,
         'max_tokens': model.max_tokens,
         'enabled': model.enabled,
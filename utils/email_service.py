@@ -1,13 +1,32 @@
 import smtplib
-import random
+import secrets
 import string
 import os
+import atexit
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from dotenv import load_dotenv
+import logging
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Deliveries run here so HTTP requests don't block on the SMTP round trip
+_EMAIL_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="email")
+
+# Message body templates, built once at import time instead of per send
+_OTP_BODY = string.Template(
+    "Hello $username,\n\nYour OTP code is: $code\nThis code is valid for 10 minutes.\n\nRegards,\nDR Detection System")
+_OTP_BODY_ANON = string.Template(
+    "Your OTP code is: $code\nThis code is valid for 10 minutes.")
+_RESET_BODY = string.Template(
+    "Hello $username,\n\nYour password reset code is: $code\nThis code is valid for 10 minutes.\n\nRegards,\nDR Detection System")
+_RESET_BODY_ANON = string.Template(
+    "Your password reset code is: $code\nThis code is valid for 10 minutes.")
+
 class EmailService:
     """Service for sending emails with OTP using SMTP (Gmail)"""
 
@@ -17,64 +36,96 @@ class EmailService:
         self.sender_password = os.getenv("SENDER_PASSWORD", "")
         self.smtp_server = os.getenv("SMTP_SERVER", "smtp.gmail.com")
         self.smtp_port = int(os.getenv("SMTP_PORT", 587))
-        
+
+        # Persistent SMTP connection, reused across sends to amortize the
+        # TLS handshake + AUTH cost (hundreds of ms per mail otherwise)
+        self._smtp = None
+        self._smtp_lock = threading.Lock()
+        atexit.register(self._close_connection)
+
         if not self.sender_email or not self.sender_password:
-            print("[DEBUG] CRITICAL: SENDER_EMAIL or SENDER_PASSWORD not configured. Email sending will fail.")
+            logger.critical("SENDER_EMAIL or SENDER_PASSWORD not configured. Email sending will fail.")
+
+    def _get_connection(self):
+        """Return a logged-in SMTP connection, creating one if needed"""
+        if self._smtp is None:
+            server = smtplib.SMTP(self.smtp_server, self.smtp_port)
+            server.starttls()  # Enable TLS
+            server.login(self.sender_email, self.sender_password)
+            self._smtp = server
+        return self._smtp
+
+    def _close_connection(self):
+        """Close the cached SMTP connection on shutdown"""
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except Exception:
+                pass
+            self._smtp = None
+
+    def _send_message(self, message):
+        """Send a message over the cached connection, reconnecting once if it dropped"""
+        with self._smtp_lock:
+            try:
+                self._get_connection().send_message(message)
+            except (smtplib.SMTPServerDisconnected, smtplib.SMTPResponseException):
+                # Stale connection (server idle timeout); reconnect and retry once
+                self._close_connection()
+                self._get_connection().send_message(message)
+
+    def _deliver(self, message, success_log):
+        """Background delivery body; failures are logged, not raised"""
+        try:
+            self._send_message(message)
+            logger.info(success_log)
+        except smtplib.SMTPAuthenticationError:
+            logger.error("Authentication failed. Check your email and App Password. Ensure 2-Step Verification is enabled and use an App Password.")
+        except Exception as e:
+            logger.exception("Error sending email: %s", e)
 
     def generate_otp(self, length=6):
         """Generate a random 6-digit OTP"""
-        characters = string.digits
-        return ''.join(random.choice(characters) for _ in range(length))
+        # One CSPRNG draw instead of a per-digit random.choice loop; secrets
+        # is also the right source for security codes (random is seedable)
+        return f"{secrets.randbelow(10 ** length):0{length}d}"
 
     def send_otp_email(self, recipient_email, otp, username=None):
         """Send OTP to the recipient's email"""
         if not self.sender_email or not self.sender_password:
-            print("Error: SENDER_EMAIL or SENDER_PASSWORD not configured in .env")
+            logger.error("SENDER_EMAIL or SENDER_PASSWORD not configured in .env")
             return False
 
         # Create message
         subject = "Your OTP Code"
         if username:
-            body_text = f"Hello {username},\n\nYour OTP code is: {otp}\nThis code is valid for 10 minutes.\n\nRegards,\nDR Detection System"
+            body_text = _OTP_BODY.substitute(username=username, code=otp)
         else:
-            body_text = f"Your OTP code is: {otp}\nThis code is valid for 10 minutes."
-            
+            body_text = _OTP_BODY_ANON.substitute(code=otp)
+
         message = MIMEMultipart()
         message["From"] = self.sender_email
         message["To"] = recipient_email
         message["Subject"] = subject
         message.attach(MIMEText(body_text, "plain"))
 
-        try:
-            # Connect to SMTP server
-            server = smtplib.SMTP(self.smtp_server, self.smtp_port)
-            server.starttls()  # Enable TLS
-            server.login(self.sender_email, self.sender_password)
-            
-            # Send email
-            server.send_message(message)
-            print(f"OTP sent successfully to {recipient_email}")
-            server.quit()
-            return True
-        except smtplib.SMTPAuthenticationError:
-            print("Authentication failed. Check your email and App Password. Ensure 2-Step Verification is enabled and use an App Password.")
-            return False
-        except Exception as e:
-            print(f"Error sending email: {str(e)}")
-            return False
-            
+        # Dispatch off the request thread; the SMTP round trip no longer
+        # blocks the caller, so failures surface in the logs instead
+        _EMAIL_EXECUTOR.submit(self._deliver, message, f"OTP sent successfully to {recipient_email}")
+        return True
+
     def send_password_reset_email(self, recipient_email, reset_code, username=None):
         """Send password reset code via email"""
         if not self.sender_email or not self.sender_password:
-            print("Error: SENDER_EMAIL or SENDER_PASSWORD not configured in .env")
+            logger.error("SENDER_EMAIL or SENDER_PASSWORD not configured in .env")
             return False
 
         # Create message
         subject = "Password Reset Code"
         if username:
-            body_text = f"Hello {username},\n\nYour password reset code is: {reset_code}\nThis code is valid for 10 minutes.\n\nRegards,\nDR Detection System"
+            body_text = _RESET_BODY.substitute(username=username, code=reset_code)
         else:
-            body_text = f"Your password reset code is: {reset_code}\nThis code is valid for 10 minutes."
+            body_text = _RESET_BODY_ANON.substitute(code=reset_code)
 
         message = MIMEMultipart()
         message["From"] = self.sender_email
@@ -82,20 +133,7 @@ class EmailService:
         message["Subject"] = subject
         message.attach(MIMEText(body_text, "plain"))
 
-        try:
-            # Connect to SMTP server
-            server = smtplib.SMTP(self.smtp_server, self.smtp_port)
-            server.starttls()  # Enable TLS
-            server.login(self.sender_email, self.sender_password)
-            
-            # Send email
-            server.send_message(message)
-            print(f"Password reset email sent successfully to {recipient_email}")
-            server.quit()
-            return True
-        except smtplib.SMTPAuthenticationError:
-            print("Authentication failed. Check your email and App Password. Ensure 2-Step Verification is enabled and use an App Password.")
-            return False
-        except Exception as e:
-            print(f"Error sending email: {str(e)}")
-            return False
+        # Dispatch off the request thread; the SMTP round trip no longer
+        # blocks the caller, so failures surface in the logs instead
+        _EMAIL_EXECUTOR.submit(self._deliver, message, f"Password reset email sent successfully to {recipient_email}")
+        return True
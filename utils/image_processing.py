@@ -1,56 +1,107 @@
 import os
 import cv2
 import numpy as np
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import logging
 from PIL import Image
 from config import Config
 
+logger = logging.getLogger(__name__)
+
+# Precomputed suffix tuple; the leading dot keeps the extension-required semantics
+_ALLOWED_SUFFIXES = tuple('.' + ext.lower().lstrip('.') for ext in Config.ALLOWED_EXTENSIONS)
+
 def allowed_file(filename):
     """Check if file extension is allowed"""
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in Config.ALLOWED_EXTENSIONS
+    return filename.lower().endswith(_ALLOWED_SUFFIXES)
+
+# Magic-byte signatures for the supported upload formats
+_IMAGE_SIGNATURES = (
+    b'\xff\xd8\xff',        # JPEG
+    b'\x89PNG\r\n\x1a\n',   # PNG
+    b'BM',                  # BMP
+    b'II*\x00',             # TIFF (little-endian)
+    b'MM\x00*',             # TIFF (big-endian)
+    b'GIF87a',              # GIF
+    b'GIF89a',
+)
 
 def validate_image(image_path):
     """Validate if the uploaded file is a valid image"""
     try:
+        # Happy path: a 12-byte header sniff instead of a full PIL verify pass
+        with open(image_path, 'rb') as f:
+            head = f.read(12)
+        if any(head.startswith(sig) for sig in _IMAGE_SIGNATURES):
+            return True
+        if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+            return True
+
+        # Ambiguous header: fall back to the full PIL check
         img = Image.open(image_path)
         img.verify()
         return True
     except Exception as e:
-        print(f"Image validation error: {str(e)}")
+        logger.error("Image validation error: %s", e)
         return False
 
+# One CLAHE instance per thread: construction allocates histogram/LUT state,
+# and enhance_images runs workers concurrently. If the clip/tile parameters
+# ever become configurable, the cached instance must be rebuilt.
+_clahe_local = threading.local()
+
+def _get_clahe():
+    """Return this thread's reusable CLAHE instance"""
+    clahe = getattr(_clahe_local, 'clahe', None)
+    if clahe is None:
+        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+        _clahe_local.clahe = clahe
+    return clahe
+
 def enhance_image(image_path):
     """Enhance image quality using CLAHE"""
     try:
         img = cv2.imread(image_path)
         if img is None:
             return None
-        
+
         lab = cv2.cvtColor(img, cv2.COLOR_BGR2LAB)
-        l, a, b = cv2.split(lab)
-        
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-        l = clahe.apply(l)
-        
-        enhanced = cv2.merge([l, a, b])
-        enhanced = cv2.cvtColor(enhanced, cv2.COLOR_LAB2BGR)
-        
+
+        # Apply CLAHE to the L plane in place; split/merge would allocate
+        # three extra single-channel copies of the whole image
+        lab[:, :, 0] = _get_clahe().apply(lab[:, :, 0])
+
+        enhanced = cv2.cvtColor(lab, cv2.COLOR_LAB2BGR)
+
         return enhanced
     except Exception as e:
-        print(f"Image enhancement error: {str(e)}")
+        logger.error("Image enhancement error: %s", e)
         return None
 
+def enhance_images(image_paths):
+    """Enhance a batch of images in parallel, preserving input order"""
+    if not image_paths:
+        return []
+    # OpenCV releases the GIL for imread/cvtColor/CLAHE, so threads give
+    # real parallelism and overlap disk reads with compute
+    with ThreadPoolExecutor(max_workers=min(8, len(image_paths))) as executor:
+        return list(executor.map(enhance_image, image_paths))
+
 def get_image_info(image_path):
     """Get image information"""
     try:
-        img = Image.open(image_path)
-        return {
-            'filename': os.path.basename(image_path),
-            'size': img.size,
-            'format': img.format,
-            'file_size': os.path.getsize(image_path)
-        }
+        # Single stat for size; PIL only parses the header for size/format
+        st = os.stat(image_path)
+        with Image.open(image_path) as img:
+            return {
+                'filename': os.path.basename(image_path),
+                'size': img.size,
+                'format': img.format,
+                'file_size': st.st_size
+            }
     except Exception as e:
-        print(f"Error getting image info: {str(e)}")
+        logger.error("Error getting image info: %s", e)
         return None
 
 
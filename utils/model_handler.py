@@ -1,8 +1,25 @@
+import hashlib
+import logging
 import os
-import os
-from config import Config
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
 
+import cv2
+import numpy as np
+from PIL import Image
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Preprocessed-input cache capacity: repeated submissions of identical bytes
+# (retries, duplicate batch entries) skip decode+resize. 16 entries of
+# (1, 380, 380, 3) float32 is ~28 MB, a deliberate cap for small workers.
+_PREPROCESS_CACHE_SIZE = 16
+
 
 class ModelHandler:
     """Handles model loading and predictions"""
@@ -10,140 +27,322 @@ class ModelHandler:
     def __init__(self):
         """Initialize the model handler"""
         self.model = None
+        self.interpreter = None
+        self.input_details = None
+        self.output_details = None
+        self._infer = None
+        self.session = None
+        self._ort_input_name = None
         self.model_path = Config.MODEL_PATH
         self.target_size = (380, 380)
         self.class_names = ["No DR", "Mild", "Moderate", "Severe", "Proliferative"]
+        # Reusable single-image input buffer, one per thread: predict()
+        # overwrites it on every call instead of allocating ~1.7 MB of
+        # float32 per inference. Batch paths allocate fresh arrays because
+        # their results must outlive the preprocessing worker.
+        self._input_local = threading.local()
+        # LRU of preprocessed inputs keyed by content hash (see chunk above)
+        self._preprocess_cache = OrderedDict()
+        self._preprocess_cache_lock = threading.Lock()
+        # The TFLite Python interpreter is not thread-safe: concurrent
+        # set_tensor/invoke calls (or a resize_tensor_input racing a
+        # single-image predict) can cross-contaminate results, so all
+        # interpreter access is serialized. ORT sessions and the Keras
+        # paths are safe for concurrent inference and stay lock-free.
+        self._interpreter_lock = threading.Lock()
         self.load_model()
-    
+
     def load_model(self):
         """Load the pre-trained model using GCSModelLoader"""
         from model_loader import GCSModelLoader
-        
+
         try:
             loader = GCSModelLoader.get_instance()
             self.model = loader.get_model()
-            
-            print(f"Model loaded successfully by ModelHandler")
+
+            logger.info("Model loaded successfully by ModelHandler")
             if self.model:
                 try:
-                    print(f"Model input shape: {self.model.input_shape}")
-                    print(f"Model output shape: {self.model.output_shape}")
+                    logger.info("Model input shape: %s", self.model.input_shape)
+                    logger.info("Model output shape: %s", self.model.output_shape)
                 except AttributeError:
-                    # Some models (like SaveModel format) might not expose these directly 
+                    # Some models (like SaveModel format) might not expose these directly
                     # in the same way depending on how they are loaded/saved
                     pass
             else:
                 raise RuntimeError("Model loaded but is None")
         except Exception as e:
-            print(f"CRITICAL: Error loading model via GCSModelLoader: {str(e)}")
+            logger.critical("Error loading model via GCSModelLoader: %s", e)
             raise RuntimeError(f"Failed to load model: {str(e)}")
 
-    
-    def preprocess_image(self, image_path):
-        """Preprocess image matching training pipeline"""
-        import cv2
-        import numpy as np
+        if Config.RUNTIME == 'onnxruntime':
+            self._init_onnx()
+            if self.session is not None:
+                return
+        self._init_tflite()
+
+    def _init_onnx(self):
+        """Convert the model to ONNX once and load it with ONNX Runtime.
+
+        ORT's CPU execution provider often beats both Keras and TFLite for
+        EfficientNet-class models on x86 servers. Needs the optional
+        onnxruntime and tf2onnx packages; any failure leaves self.session as
+        None and the TFLite path is used instead.
+        """
+        onnx_path = self.model_path + '.onnx'
+        try:
+            import onnxruntime as ort
+
+            if not os.path.exists(onnx_path):
+                import tf2onnx
+                logger.info("Converting model to ONNX at %s...", onnx_path)
+                tf2onnx.convert.from_keras(self.model, opset=17, output_path=onnx_path)
+
+            so = ort.SessionOptions()
+            so.intra_op_num_threads = os.cpu_count()
+            so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            self.session = ort.InferenceSession(
+                onnx_path, sess_options=so, providers=['CPUExecutionProvider'])
+            self._ort_input_name = self.session.get_inputs()[0].name
+            logger.info("ONNX Runtime session initialized for CPU inference")
+        except Exception as e:
+            logger.warning("ONNX Runtime unavailable, falling back to TFLite: %s", e)
+            self.session = None
+
+    def _init_tflite(self):
+        """Convert the model to TFLite once and load it for fast CPU inference.
+
+        model.predict carries Keras dispatch overhead that dominates
+        batch_size=1 latency; the TFLite interpreter (XNNPACK kernels) avoids
+        it. The converted FlatBuffer is cached next to MODEL_PATH. Any failure
+        leaves self.interpreter as None and predictions fall back to Keras.
+        """
         import tensorflow as tf
 
+        quantization = Config.QUANTIZATION
+        suffix = '.fp16.tflite' if quantization == 'fp16' else '.tflite'
+        tflite_path = self.model_path + suffix
         try:
-            # Read image with validation
-            img = cv2.imread(image_path)
-            if img is None:
-                raise ValueError(f"Could not read image file: {image_path}")
-            
-            # Check image shape
-            if img.shape[2] != 3:
-                raise ValueError(f"Expected 3-channel image, got {img.shape[2]} channels")
-            
-            # Convert BGR to RGB
-            img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-            
-            # Resize to target size
-            original_shape = img.shape
-            img = cv2.resize(img, self.target_size, interpolation=cv2.INTER_LINEAR)
-            print(f"[PREPROCESS] Image resized from {original_shape} to {img.shape}")
-            
-            # Apply preprocessing - using EfficientNet normalization
-            # This scales pixel values to [-1, 1] range
-            img = tf.keras.applications.efficientnet.preprocess_input(img)
-            
-            # Validate preprocessed image
-            if np.isnan(img).any() or np.isinf(img).any():
-                raise ValueError("Preprocessed image contains NaN or Inf values")
-            
-            # Add batch dimension
-            img_batch = np.expand_dims(img, axis=0)
-            print(f"[PREPROCESS] Final batch shape: {img_batch.shape}")
-            
-            return img_batch
+            if not os.path.exists(tflite_path):
+                logger.info("Converting model to TFLite at %s...", tflite_path)
+                converter = tf.lite.TFLiteConverter.from_keras_model(self.model)
+                if quantization == 'fp16':
+                    # Post-training float16 quantization: halves weight size
+                    # and DRAM traffic with negligible accuracy loss
+                    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+                    converter.target_spec.supported_types = [tf.float16]
+                tflite_model = converter.convert()
+                with open(tflite_path, 'wb') as f:
+                    f.write(tflite_model)
+
+            interpreter = tf.lite.Interpreter(model_path=tflite_path, num_threads=os.cpu_count())
+            interpreter.allocate_tensors()
+            self.interpreter = interpreter
+            self.input_details = interpreter.get_input_details()
+            self.output_details = interpreter.get_output_details()
+            logger.info("TFLite interpreter initialized for CPU inference")
         except Exception as e:
-            print(f"ERROR in preprocess_image: {str(e)}")
+            logger.warning("TFLite conversion unavailable, falling back to Keras predict: %s", e)
+            self.interpreter = None
+            self._init_keras_infer(tf)
+
+    def _init_keras_infer(self, tf):
+        """Trace the model once with tf.function for the Keras fallback path.
+
+        Calling the traced function skips Model.predict's data-adapter,
+        callback and distribution machinery, which dominates batch_size=1
+        latency. reduce_retracing keeps one trace serving both the single
+        image and the variable-size batch shapes.
+        """
+        try:
+            self._infer = tf.function(
+                lambda x: self.model(x, training=False), reduce_retracing=True)
+        except Exception as e:
+            logger.warning("tf.function trace unavailable, using model.predict: %s", e)
+            self._infer = None
+
+    def _decode_resize_pillow(self, fp):
+        """Decode and resize via Pillow, returning an RGB uint8 array.
+
+        With Pillow-SIMD installed this uses AVX2 resampling kernels, and
+        JPEG draft mode lets libjpeg do a coarse 1/2-1/8 downscale during
+        decode (a no-op for other formats) before the final resize.
+        """
+        img = Image.open(fp)
+        img.draft('RGB', self.target_size)
+        img = img.convert('RGB').resize(self.target_size, Image.BILINEAR)
+        return np.asarray(img)
+
+    def _get_input_buf(self):
+        """Return this thread's reusable (1, H, W, 3) float32 input buffer"""
+        buf = getattr(self._input_local, 'buf', None)
+        if buf is None:
+            buf = np.empty((1,) + self.target_size + (3,), dtype=np.float32)
+            self._input_local.buf = buf
+        return buf
+
+    def _run_inference(self, img_batch):
+        """Run the model on a preprocessed batch via ORT, TFLite or Keras"""
+        if self.session is not None:
+            return self.session.run(
+                None, {self._ort_input_name: np.ascontiguousarray(img_batch, dtype=np.float32)})[0]
+
+        if self.interpreter is not None:
+            with self._interpreter_lock:
+                input_index = self.input_details[0]['index']
+                if self.input_details[0]['shape'][0] != img_batch.shape[0]:
+                    self.interpreter.resize_tensor_input(input_index, img_batch.shape)
+                    self.interpreter.allocate_tensors()
+                    self.input_details = self.interpreter.get_input_details()
+                    self.output_details = self.interpreter.get_output_details()
+                self.interpreter.set_tensor(input_index, np.ascontiguousarray(img_batch, dtype=np.float32))
+                self.interpreter.invoke()
+                return self.interpreter.get_tensor(self.output_details[0]['index'])
+
+        if self._infer is not None:
+            return self._infer(img_batch).numpy()
+
+        if not hasattr(self.model, 'predict'):
+            raise RuntimeError("Model does not have predict method")
+        return self.model.predict(img_batch, verbose=0)
+
+
+    def preprocess_image(self, image_path, out=None):
+        """Preprocess image matching training pipeline"""
+        try:
+            if Config.DECODER == 'pillow':
+                # Pillow decodes straight to RGB at target size
+                img = self._decode_resize_pillow(image_path)
+            else:
+                # Read image with validation
+                img = cv2.imread(image_path)
+                if img is None:
+                    raise ValueError(f"Could not read image file: {image_path}")
+
+                # Check image shape
+                if img.shape[2] != 3:
+                    raise ValueError(f"Expected 3-channel image, got {img.shape[2]} channels")
+
+                # Resize first, then swap BGR->RGB as a reversed view on the much
+                # smaller target-size result; a cvtColor pass over the full-size
+                # decode moves multi-MB of pixels for nothing
+                original_shape = img.shape
+                # INTER_AREA hits OpenCV's SIMD kernels and is the more accurate
+                # choice when shrinking; fundus images usually arrive well above
+                # the 380px target
+                interp = cv2.INTER_AREA if max(original_shape[:2]) > self.target_size[0] else cv2.INTER_LINEAR
+                img = cv2.resize(img, self.target_size, interpolation=interp)
+                img = img[..., ::-1]
+
+            # EfficientNet's keras preprocess_input is a documented pass-through
+            # (normalization is a Rescaling layer inside the model), so the only
+            # real work is the uint8 -> float32 conversion, done in one pass
+            # while writing into the batched output buffer
+            if out is None:
+                out = np.empty((1,) + self.target_size + (3,), dtype=np.float32)
+            np.copyto(out[0], img, casting='safe')
+            return out
+        except Exception as e:
+            logger.error("ERROR in preprocess_image: %s", e)
             raise
     
-    def preprocess_image_from_bytes(self, image_bytes):
+    def preprocess_image_from_bytes(self, image_bytes, out=None):
         """Preprocess image from bytes matching training pipeline"""
-        import cv2
-        import numpy as np
-        import tensorflow as tf
+        key = None
+        if Config.PREPROCESS_CACHE:
+            # blake2b over the raw bytes costs far less than the decode it
+            # can save on a hit
+            key = hashlib.blake2b(image_bytes, digest_size=16).digest()
+            with self._preprocess_cache_lock:
+                cached = self._preprocess_cache.get(key)
+                if cached is not None:
+                    self._preprocess_cache.move_to_end(key)
+            if cached is not None:
+                if out is None:
+                    return cached
+                np.copyto(out, cached)
+                return out
 
         try:
-            # Convert bytes to numpy array
-            nparr = np.frombuffer(image_bytes, np.uint8)
-            
-            # Decode image
-            img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-            if img is None:
-                raise ValueError("Could not decode image from bytes")
-            
-            # Check image shape
-            if img.shape[2] != 3:
-                raise ValueError(f"Expected 3-channel image, got {img.shape[2]} channels")
-            
-            # Convert BGR to RGB
-            img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-            
-            # Resize to target size
-            original_shape = img.shape
-            img = cv2.resize(img, self.target_size, interpolation=cv2.INTER_LINEAR)
-            print(f"[PREPROCESS] Image resized from {original_shape} to {img.shape}")
-            
-            # Apply preprocessing - using EfficientNet normalization
-            # This scales pixel values to [-1, 1] range
-            img = tf.keras.applications.efficientnet.preprocess_input(img)
-            
-            # Validate preprocessed image
-            if np.isnan(img).any() or np.isinf(img).any():
-                raise ValueError("Preprocessed image contains NaN or Inf values")
-            
-            # Add batch dimension
-            img_batch = np.expand_dims(img, axis=0)
-            print(f"[PREPROCESS] Final batch shape: {img_batch.shape}")
-            
-            return img_batch
+            if Config.DECODER == 'pillow':
+                # Pillow decodes straight to RGB at target size
+                img = self._decode_resize_pillow(BytesIO(image_bytes))
+            else:
+                # Convert bytes to numpy array
+                nparr = np.frombuffer(image_bytes, np.uint8)
+
+                # Decode image
+                img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+                if img is None:
+                    raise ValueError("Could not decode image from bytes")
+
+                # Check image shape
+                if img.shape[2] != 3:
+                    raise ValueError(f"Expected 3-channel image, got {img.shape[2]} channels")
+
+                # Resize first, then swap BGR->RGB as a reversed view on the much
+                # smaller target-size result; a cvtColor pass over the full-size
+                # decode moves multi-MB of pixels for nothing
+                original_shape = img.shape
+                # INTER_AREA hits OpenCV's SIMD kernels and is the more accurate
+                # choice when shrinking; fundus images usually arrive well above
+                # the 380px target
+                interp = cv2.INTER_AREA if max(original_shape[:2]) > self.target_size[0] else cv2.INTER_LINEAR
+                img = cv2.resize(img, self.target_size, interpolation=interp)
+                img = img[..., ::-1]
+
+            # EfficientNet's keras preprocess_input is a documented pass-through
+            # (normalization is a Rescaling layer inside the model), so the only
+            # real work is the uint8 -> float32 conversion, done in one pass
+            # while writing into the batched output buffer
+            caller_buf = out is not None
+            if out is None:
+                out = np.empty((1,) + self.target_size + (3,), dtype=np.float32)
+            np.copyto(out[0], img, casting='safe')
+            if key is not None:
+                # Never cache a caller-owned reusable buffer; it gets
+                # overwritten on the next call
+                with self._preprocess_cache_lock:
+                    self._preprocess_cache[key] = out.copy() if caller_buf else out
+                    if len(self._preprocess_cache) > _PREPROCESS_CACHE_SIZE:
+                        self._preprocess_cache.popitem(last=False)
+            return out
         except Exception as e:
-            print(f"ERROR in preprocess_image_from_bytes: {str(e)}")
+            logger.error("ERROR in preprocess_image_from_bytes: %s", e)
             raise
     
-    def predict(self, image_path):
-        """Make a prediction on a single image"""
-        import numpy as np
+    def _build_result(self, prediction_scores, return_all=True):
+        """Build the standard result dict from one row of prediction scores"""
+        # Index with the argmax result instead of a second np.max reduction
+        predicted_class = int(prediction_scores.argmax())
+        confidence = float(prediction_scores[predicted_class])
+        result = {
+            'class_id': predicted_class,
+            'class_name': self.class_names[predicted_class],
+            'confidence': confidence,
+            'confidence_percent': round(confidence * 100, 2),
+        }
+        if return_all:
+            # tolist() converts all scores to Python floats in one C call,
+            # instead of five per-element float() round trips
+            result['all_predictions'] = dict(zip(self.class_names, prediction_scores.tolist()))
+        return result
 
+    def predict(self, image_path, return_all=True):
+        """Make a prediction on a single image
+
+        Pass return_all=False to skip the per-class all_predictions dict when
+        only the top-1 result is needed.
+        """
         try:
-            if not self.model:
+            if not self.model and self.interpreter is None:
                 raise RuntimeError("Model not loaded. Cannot perform prediction.")
             
-            print(f"[PREDICT] Starting prediction for {image_path}")
-            
             # Preprocess image
-            img_array = self.preprocess_image(image_path)
-            
-            # Validate model is callable
-            if not hasattr(self.model, 'predict'):
-                raise RuntimeError("Model does not have predict method")
+            img_array = self.preprocess_image(image_path, out=self._get_input_buf())
             
             # Run prediction
-            print(f"[PREDICT] Running model inference...")
-            predictions = self.model.predict(img_array, verbose=0)
+            predictions = self._run_inference(img_array)
             
             # Validate predictions shape
             if predictions.shape[0] != 1:
@@ -152,46 +351,30 @@ class ModelHandler:
                 raise ValueError(f"Expected {len(self.class_names)} classes, got {predictions.shape[1]}")
             
             # Extract prediction results
-            prediction_scores = predictions[0]
-            predicted_class = np.argmax(prediction_scores)
-            confidence = float(np.max(prediction_scores))
-            
-            print(f"[PREDICT] Predicted class: {self.class_names[predicted_class]} ({confidence*100:.2f}%)")
-            
-            # Build result dictionary
-            result = {
-                'class_id': int(predicted_class),
-                'class_name': self.class_names[int(predicted_class)],
-                'confidence': float(confidence),
-                'confidence_percent': round(float(confidence) * 100, 2),
-                'all_predictions': {self.class_names[i]: float(prediction_scores[i]) for i in range(len(self.class_names))}
-            }
-            
+            result = self._build_result(predictions[0], return_all=return_all)
+
+            logger.debug("[PREDICT] Predicted class: %s (%.2f%%)", result['class_name'], result['confidence_percent'])
+
             return result
         except Exception as e:
-            print(f"CRITICAL ERROR in predict: {str(e)}")
+            logger.error("CRITICAL ERROR in predict: %s", e)
             raise RuntimeError(f"Prediction failed for {image_path}: {str(e)}")
     
-    def predict_from_bytes(self, image_bytes):
-        """Make a prediction on image bytes"""
-        import numpy as np
+    def predict_from_bytes(self, image_bytes, return_all=True):
+        """Make a prediction on image bytes
 
+        Pass return_all=False to skip the per-class all_predictions dict when
+        only the top-1 result is needed.
+        """
         try:
-            if not self.model:
+            if not self.model and self.interpreter is None:
                 raise RuntimeError("Model not loaded. Cannot perform prediction.")
             
-            print(f"[PREDICT] Starting prediction from bytes")
-            
             # Preprocess image from bytes
-            img_array = self.preprocess_image_from_bytes(image_bytes)
-            
-            # Validate model is callable
-            if not hasattr(self.model, 'predict'):
-                raise RuntimeError("Model does not have predict method")
+            img_array = self.preprocess_image_from_bytes(image_bytes, out=self._get_input_buf())
             
             # Run prediction
-            print(f"[PREDICT] Running model inference...")
-            predictions = self.model.predict(img_array, verbose=0)
+            predictions = self._run_inference(img_array)
             
             # Validate predictions shape
             if predictions.shape[0] != 1:
@@ -200,78 +383,115 @@ class ModelHandler:
                 raise ValueError(f"Expected {len(self.class_names)} classes, got {predictions.shape[1]}")
             
             # Extract prediction results
-            prediction_scores = predictions[0]
-            predicted_class = np.argmax(prediction_scores)
-            confidence = float(np.max(prediction_scores))
-            
-            print(f"[PREDICT] Predicted class: {self.class_names[predicted_class]} ({confidence*100:.2f}%)")
-            
-            # Build result dictionary
-            result = {
-                'class_id': int(predicted_class),
-                'class_name': self.class_names[int(predicted_class)],
-                'confidence': float(confidence),
-                'confidence_percent': round(float(confidence) * 100, 2),
-                'all_predictions': {self.class_names[i]: float(prediction_scores[i]) for i in range(len(self.class_names))}
-            }
-            
+            result = self._build_result(predictions[0], return_all=return_all)
+
+            logger.debug("[PREDICT] Predicted class: %s (%.2f%%)", result['class_name'], result['confidence_percent'])
+
             return result
         except Exception as e:
-            print(f"CRITICAL ERROR in predict_from_bytes: {str(e)}")
+            logger.error("CRITICAL ERROR in predict_from_bytes: %s", e)
             raise RuntimeError(f"Prediction failed from bytes: {str(e)}")
     
-    def batch_predict(self, image_paths):
-        """Make predictions on multiple images"""
-        results = []
-        print(f"[BATCH_PREDICT] Processing {len(image_paths)} images")
-        
-        for idx, image_path in enumerate(image_paths, 1):
+    def _preprocess_parallel(self, inputs, preprocess_fn):
+        """Preprocess a batch of inputs concurrently
+
+        cv2 releases the GIL during decode/resize, so a thread pool overlaps
+        the per-image work. Returns (arrays, errors): arrays holds one entry
+        per input with None where preprocessing failed, and errors maps the
+        failed index to its error message.
+        """
+        if not inputs:
+            return [], {}
+
+        def worker(item):
             try:
-                print(f"[BATCH_PREDICT] Image {idx}/{len(image_paths)}: {image_path}")
-                result = self.predict(image_path)
-                result['image_path'] = image_path
-                result['status'] = 'success'
-                results.append(result)
-                print(f"[BATCH_PREDICT] ✓ Image {idx} completed successfully")
+                return preprocess_fn(item), None
             except Exception as e:
-                error_msg = str(e)
-                print(f"[BATCH_PREDICT] ✗ Image {idx} failed: {error_msg}")
-                results.append({
-                    'image_path': image_path,
-                    'error': error_msg,
-                    'status': 'error'
-                })
-        
-        successful = sum(1 for r in results if r['status'] == 'success')
-        failed = sum(1 for r in results if r['status'] == 'error')
-        print(f"[BATCH_PREDICT] Complete - Success: {successful}, Failed: {failed}")
-        
+                return None, str(e)
+
+        workers = min(os.cpu_count() or 1, len(inputs))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            outcomes = list(executor.map(worker, inputs))
+
+        arrays = [arr for arr, _ in outcomes]
+        errors = {i: msg for i, (_, msg) in enumerate(outcomes) if msg is not None}
+        return arrays, errors
+
+    def _batch_predict_arrays(self, key_field, keys, arrays):
+        """Run one batched inference over preprocessed arrays and build per-image results
+
+        `arrays` holds a (1, H, W, 3) array per image, or None where
+        preprocessing failed (those slots are skipped, the caller records the
+        error). Returns a dict mapping list index -> success result dict.
+        """
+        valid_indices = [i for i, arr in enumerate(arrays) if arr is not None]
+        if not valid_indices:
+            return {}
+
+        # One forward pass over the whole batch instead of N single-image
+        # calls; this is where batching actually pays off
+        batch = np.vstack([arrays[i] for i in valid_indices])
+        predictions = self._run_inference(batch)
+
+        if predictions.shape[1] != len(self.class_names):
+            raise ValueError(f"Expected {len(self.class_names)} classes, got {predictions.shape[1]}")
+
+        results = {}
+        for row, i in enumerate(valid_indices):
+            result = self._build_result(predictions[row])
+            result[key_field] = keys[i]
+            result['status'] = 'success'
+            results[i] = result
         return results
-    
+
+    def batch_predict(self, image_paths):
+        """Make predictions on multiple images"""
+        if not self.model and self.interpreter is None:
+            raise RuntimeError("Model not loaded. Cannot perform prediction.")
+
+        # Preprocess in parallel; a bad image only fails its own slot
+        arrays, failures = self._preprocess_parallel(image_paths, self.preprocess_image)
+        errors = {}
+        for idx, error_msg in failures.items():
+            logger.warning("[BATCH_PREDICT] Image %d failed: %s", idx + 1, error_msg)
+            errors[idx] = {'image_path': image_paths[idx], 'error': error_msg, 'status': 'error'}
+
+        successes = self._batch_predict_arrays('image_path', image_paths, arrays)
+        results = [successes.get(i) or errors[i] for i in range(len(image_paths))]
+
+        logger.info("[BATCH_PREDICT] %d images - Success: %d, Failed: %d", len(results), len(successes), len(errors))
+
+        return results
+
     def batch_predict_from_bytes(self, image_files):
         """Make predictions on multiple image files (bytes)"""
-        results = []
-        print(f"[BATCH_PREDICT] Processing {len(image_files)} image files from bytes")
-        
-        for idx, (filename, file_bytes) in enumerate(image_files, 1):
-            try:
-                print(f"[BATCH_PREDICT] Image {idx}/{len(image_files)}: {filename}")
-                result = self.predict_from_bytes(file_bytes)
-                result['filename'] = filename
-                result['status'] = 'success'
-                results.append(result)
-                print(f"[BATCH_PREDICT] ✓ Image {idx} completed successfully")
-            except Exception as e:
-                error_msg = str(e)
-                print(f"[BATCH_PREDICT] ✗ Image {idx} failed: {error_msg}")
-                results.append({
-                    'filename': filename,
-                    'error': error_msg,
-                    'status': 'error'
-                })
-        
-        successful = sum(1 for r in results if r['status'] == 'success')
-        failed = sum(1 for r in results if r['status'] == 'error')
-        print(f"[BATCH_PREDICT] Complete - Success: {successful}, Failed: {failed}")
-        
-        return results
\ No newline at end of file
+        if not self.model and self.interpreter is None:
+            raise RuntimeError("Model not loaded. Cannot perform prediction.")
+
+        filenames = [filename for filename, _ in image_files]
+
+        # Preprocess in parallel; a bad image only fails its own slot
+        arrays, failures = self._preprocess_parallel(
+            [file_bytes for _, file_bytes in image_files], self.preprocess_image_from_bytes)
+        errors = {}
+        for idx, error_msg in failures.items():
+            logger.warning("[BATCH_PREDICT] Image %d failed: %s", idx + 1, error_msg)
+            errors[idx] = {'filename': filenames[idx], 'error': error_msg, 'status': 'error'}
+
+        successes = self._batch_predict_arrays('filename', filenames, arrays)
+        results = [successes.get(i) or errors[i] for i in range(len(image_files))]
+
+        logger.info("[BATCH_PREDICT] %d images - Success: %d, Failed: %d", len(results), len(successes), len(errors))
+
+        return results
+
+@lru_cache(maxsize=1)
+def get_handler() -> "ModelHandler":
+    """Return the process-wide ModelHandler, constructing it on first use.
+
+    Every ModelHandler() loads the full EfficientNet weights, so callers
+    must share one instance. With gunicorn --preload the handler built in
+    the master is forked into workers, keeping the weights copy-on-write
+    shared across processes.
+    """
+    return ModelHandler()